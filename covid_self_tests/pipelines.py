@@ -2,7 +2,9 @@
 #
 # Don't forget to add your pipeline to the ITEM_PIPELINES setting
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
+import os
 import pathlib
+from concurrent import futures
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
@@ -21,14 +23,26 @@ class PdfExtractTextFilesPipeline(files.FilesPipeline):
             use_verbose=True,
         )
         self._store_base_abs = pathlib.Path(self.store.basedir).absolute()
+        # xpdf runs as a separate process, so threads are enough to run it in parallel
+        self._xpdf_pool = futures.ThreadPoolExecutor(
+            max_workers=settings.getint("XPDF_WORKERS") or os.cpu_count()
+        )
+
+    def close_spider(self, spider):
+        self._xpdf_pool.shutdown()
 
     def item_completed(self, results, item, info):
         adapter = ItemAdapter(super().item_completed(results, item, info))
         item_files = adapter.get("files", [])
-        for file in item_files:
-            pdf_file = pathlib.Path(self._store_base_abs, file.get("path"))
-            output_dir = pdf_file.parent
-            prog_result = self._xpdf.text(pdf_file, output_dir, self._xpdf_text_args)
+        pdf_files = [
+            pathlib.Path(self._store_base_abs, file.get("path")) for file in item_files
+        ]
+        prog_results = self._xpdf_pool.map(self._extract_text, pdf_files)
+        for file, prog_result in zip(item_files, prog_results):
             text_file = prog_result.output_path.relative_to(self._store_base_abs)
             file["pdf_text"] = "/".join(text_file.parts)
         return item
+
+    def _extract_text(self, pdf_file: pathlib.Path):
+        output_dir = pdf_file.parent
+        return self._xpdf.text(pdf_file, output_dir, self._xpdf_text_args)
@@ -1,4 +1,5 @@
 import dataclasses
+import functools
 import re
 import typing
 import unicodedata
@@ -6,6 +7,56 @@ from datetime import datetime
 
 from covid_self_tests.report.tga_rats import logger
 
+_PDF_PAREN_RE = re.compile(r"\(pdf.*?\)")
+_NON_WORD_RE = re.compile(r"[^\w\s-]")
+_DASH_SPACE_RE = re.compile(r"[-\s]+")
+
+_POCT_WORDS = frozenset({"poct"})
+_POCT_USES = frozenset({"Laboratory/Point-of-care test", "Point-of-care test"})
+_SELF_WORDS = frozenset({"self", "selftest", "home"})
+_SELF_USES = frozenset({"Self-test", ""})
+_LAB_WORDS = frozenset({"laboratory", "lab"})
+_LAB_USES = frozenset({"Laboratory", "Laboratory/Point-of-care test"})
+_COMMON_WORDS = frozenset(
+    {
+        "test",
+        "testing",
+        "antigen",
+        "rapid",
+        "for",
+        "use",
+        "selftests",
+        "and",
+        "nasal",
+        "swab",
+        "oral",
+        "fluid",
+        "self",
+        "kit",
+    }
+)
+
+
+@functools.lru_cache(maxsize=8192)
+def _slugify(value: str, allow_unicode: bool = False) -> str:
+    """
+    Convert to ASCII if 'allow_unicode' is False. Convert spaces or repeated
+    dashes to single dashes. Remove characters that aren't alphanumerics,
+    underscores, or hyphens. Convert to lowercase. Also strip leading and
+    trailing whitespace, dashes, and underscores.
+    """
+    # from django: https://github.com/django/django/blob/4.2/django/utils/text.py
+    if allow_unicode:
+        value = unicodedata.normalize("NFKC", value)
+    else:
+        value = (
+            unicodedata.normalize("NFKD", value)
+            .encode("ascii", "ignore")
+            .decode("ascii")
+        )
+    value = _NON_WORD_RE.sub("", value.lower())
+    return _DASH_SPACE_RE.sub("-", value).strip("-_")
+
 
 @dataclasses.dataclass
 class RatReviewManufacturerEvidence:
@@ -27,10 +78,7 @@ class RatReviewBatch:
 
     @property
     def all_compliant(self):
-        for i in self.analytical_sensitivities:
-            if not i.compliant:
-                return False
-        return True
+        return all(i.compliant for i in self.analytical_sensitivities)
 
 
 @dataclasses.dataclass
@@ -83,6 +131,7 @@ class ProductMatchInfo:
         return self.is_self and not self.is_lab and not self.is_poct
 
     @classmethod
+    @functools.lru_cache(maxsize=4096)
     def from_raw(
         cls,
         name: str,
@@ -94,8 +143,7 @@ class ProductMatchInfo:
         for find, replace in replacements:
             new_name = new_name.replace(find, replace)
 
-        pdf_pattern = re.compile(r"\(pdf.*?\)")
-        pdf_match = pdf_pattern.search(new_name)
+        pdf_match = _PDF_PAREN_RE.search(new_name)
         if pdf_match:
             new_name_0 = 0
             new_name_1 = pdf_match.start()
@@ -104,31 +152,25 @@ class ProductMatchInfo:
 
         slug = cls._slugify(new_name)
         split = slug.split("-")
+        split_words = set(split)
 
         # is this a point of care tests (POCT)?
         is_poct = (
-            any(w in split for w in ["poct"])
-            or intended_use
-            in [
-                "Laboratory/Point-of-care test",
-                "Point-of-care test",
-            ]
+            not _POCT_WORDS.isdisjoint(split_words)
+            or intended_use in _POCT_USES
             or "point-of-care" in slug
         )
 
         # is this a self test?
         # intended_use == "" is an empty value, assume self test
         is_self = (
-            any(w in split for w in ["self", "selftest", "home"])
-            or intended_use in ["Self-test", ""]
+            not _SELF_WORDS.isdisjoint(split_words)
+            or intended_use in _SELF_USES
             or "self-test" in slug
         )
 
         # is this a lab test?
-        is_lab = any(w in split for w in ["laboratory", "lab"]) or intended_use in [
-            "Laboratory",
-            "Laboratory/Point-of-care test",
-        ]
+        is_lab = not _LAB_WORDS.isdisjoint(split_words) or intended_use in _LAB_USES
 
         if not is_poct and not is_self and not is_lab:
             logger.warning("No information on intended use. Assuming self test.")
@@ -146,23 +188,7 @@ class ProductMatchInfo:
 
         # some names are only different by common or unnecessary words,
         # so remove them
-        common_words = [
-            "test",
-            "testing",
-            "antigen",
-            "rapid",
-            "for",
-            "use",
-            "selftests",
-            "and",
-            "nasal",
-            "swab",
-            "oral",
-            "fluid",
-            "self",
-            "kit",
-        ]
-        norm = [w for w in split if w not in common_words]
+        norm = [w for w in split if w not in _COMMON_WORDS]
 
         norm_slug = "-".join(norm)
 
@@ -179,24 +205,7 @@ class ProductMatchInfo:
 
     @classmethod
     def _slugify(cls, value, allow_unicode=False) -> str:
-        """
-        Convert to ASCII if 'allow_unicode' is False. Convert spaces or repeated
-        dashes to single dashes. Remove characters that aren't alphanumerics,
-        underscores, or hyphens. Convert to lowercase. Also strip leading and
-        trailing whitespace, dashes, and underscores.
-        """
-        # from django: https://github.com/django/django/blob/4.2/django/utils/text.py
-        value = str(value)
-        if allow_unicode:
-            value = unicodedata.normalize("NFKC", value)
-        else:
-            value = (
-                unicodedata.normalize("NFKD", value)
-                .encode("ascii", "ignore")
-                .decode("ascii")
-            )
-        value = re.sub(r"[^\w\s-]", "", value.lower())
-        return re.sub(r"[-\s]+", "-", value).strip("-_")
+        return _slugify(str(value), allow_unicode)
 
 
 @dataclasses.dataclass
@@ -222,6 +231,11 @@ class ProductInfo:
     errors: dict[str, set] = dataclasses.field(default_factory=dict)
 
     def set_prop(self, key: str, value: str):
+        """
+        Set a property if it has no value yet. The first value set is kept,
+        so the order the sources are added sets their priority. A different
+        value from a later source is recorded in 'errors' as a mismatch.
+        """
         if not hasattr(self, key) or key == "errors":
             raise ValueError({key: value})
 
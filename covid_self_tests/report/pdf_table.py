@@ -1,12 +1,33 @@
 import pathlib
 import re
+import sys
 import typing
 from datetime import datetime
 
-import chardet as chardet
-
 from covid_self_tests.report import models
 
+_RESULT_DATE_RE = re.compile(
+    r"^Results\s+as\s+at\s+(?P<date>\d+\s+\S+\s+\d+).*?http.*$", re.ASCII
+)
+_PAGE_OF_RE = re.compile(r"^Page\s+\d+\s+of\s+\d+$", re.ASCII)
+_MONTHS = {
+    "january": 1,
+    "february": 2,
+    "march": 3,
+    "april": 4,
+    "may": 5,
+    "june": 6,
+    "july": 7,
+    "august": 8,
+    "september": 9,
+    "october": 10,
+    "november": 11,
+    "december": 12,
+}
+# text that runs on past the end of a column, read in pairs of characters
+# (the width of the column separator) until a pair is all whitespace
+_EXTRA_TEXT_RE = re.compile(r"(?:\S.?|\s\S)*", re.DOTALL)
+
 
 class PdfTableDocument:
     _key_lines = {
@@ -19,61 +40,59 @@ class PdfTableDocument:
         "tests-protein-studies": "In manufacturer provided evidence, "
         "variants that have only been tested with recombinant protein studies.",
     }
+    _key_lines_items = tuple(_key_lines.items())
 
     def read(self, file_path: pathlib.Path) -> models.RatReviewTable:
         with open(file_path, "rb") as f:
             raw = f.read()
 
-        result_date_pattern = re.compile(
-            r"^Results\s+as\s+at\s+(?P<date>\d+\s+\S+\s+\d+).*?http.*$"
-        )
-        page_of_pattern = re.compile(r"^Page\s+\d+\s+of\s+\d+$")
-
         indicators = {}
         headers = {}
         data = []
 
-        encoding_detected = chardet.detect(raw)
-        encoding = encoding_detected.get("encoding")
-        text = raw.decode(encoding)
-        pages = text.split("\f")
+        # the xpdf text is expected to be utf-8, otherwise it is likely latin-1
+        try:
+            text = raw.decode("utf-8")
+        except UnicodeDecodeError:
+            text = raw.decode("latin-1")
         result_date = None
-        for page_index, page in enumerate(pages):
-            headers[page_index] = PdfTableHeader()
-            lines = page.splitlines()
-
-            for line in lines:
-                if not line or not line.strip():
-                    continue
+        for page_index, line in self._iter_lines(text):
+            if page_index not in headers:
+                headers[page_index] = PdfTableHeader()
+
+            # match on the stripped line, but keep the original line
+            # for the header and row logic, as it relies on the column positions
+            stripped = line.strip()
+            if not stripped:
+                continue
 
-                result_date_match = result_date_pattern.fullmatch(line.strip())
-                if result_date_match:
-                    if not result_date:
-                        result_date = datetime.strptime(
-                            result_date_match.group("date"), "%d %B %Y"
-                        )
-                    continue
+            result_date_match = _RESULT_DATE_RE.fullmatch(stripped)
+            if result_date_match:
+                if not result_date:
+                    day, month, year = result_date_match.group("date").split()
+                    result_date = datetime(int(year), _MONTHS[month.lower()], int(day))
+                continue
 
-                page_of_match = page_of_pattern.fullmatch(line.strip())
-                if page_of_match:
-                    continue
+            page_of_match = _PAGE_OF_RE.fullmatch(stripped)
+            if page_of_match:
+                continue
 
-                indicators_raw = self._key_indicator(line)
-                if indicators_raw:
-                    indicators[indicators_raw[0]] = indicators_raw[1]
-                    continue
+            indicators_raw = self._key_indicator(line)
+            if indicators_raw:
+                indicators[indicators_raw[0]] = indicators_raw[1]
+                continue
 
-                is_header = headers[page_index].add_header_line(line)
-                if is_header:
-                    continue
+            is_header = headers[page_index].add_header_line(line)
+            if is_header:
+                continue
 
-                if not headers[page_index].is_complete:
-                    continue
+            if not headers[page_index].is_complete:
+                continue
 
-                item = headers[page_index].get_row(line)
-                item["page"] = page_index + 1
+            item = headers[page_index].get_row(line)
+            item["page"] = page_index + 1
 
-                data.append(item)
+            data.append(item)
 
         convert = PdfTableToRatReviewEntries()
         entries = convert.build(data, indicators)
@@ -81,60 +100,83 @@ class PdfTableDocument:
         result = models.RatReviewTable(date=result_date, entries=entries)
         return result
 
+    def _iter_lines(self, text: str) -> typing.Iterator[tuple[int, str]]:
+        # pages are separated by form feeds
+        page_index = 0
+        page_start = 0
+        while True:
+            page_end = text.find("\f", page_start)
+            if page_end < 0:
+                page = text[page_start:]
+            else:
+                page = text[page_start:page_end]
+
+            for line in page.splitlines():
+                yield page_index, line
+
+            if page_end < 0:
+                return
+
+            page_index += 1
+            page_start = page_end + 1
+
     def _key_indicator(self, line: str) -> typing.Optional[tuple[str, str]]:
-        for key, value in self._key_lines.items():
+        for key, value in self._key_lines_items:
             if value in line:
                 return key, line[0]
         return None
 
 
 class PdfTableHeader:
-    _raw_columns = [
-        {"name": "artg", "columns": ["ARTG"], "align": "left"},
-        {"name": "sponsor", "columns": ["Sponsor"], "align": "left"},
-        {"name": "manufacturer", "columns": ["Manufacturer"], "align": "left"},
-        {"name": "name", "columns": ["Test Kit name"], "align": "left"},
-        {
-            "name": "batch",
-            "columns": ["TGA testing", "", "Batch number"],
-            "align": "middle",
-        },
-        {
-            "name": "wild",
-            "columns": ["TGA", "testing", "", "Wild type", "analytical", "sensitivity"],
-            "align": "middle",
-        },
-        {
-            "name": "delta",
-            "columns": ["TGA", "testing", "", "Delta", "analytical", "sensitivity"],
-            "align": "middle",
-        },
-        {
-            "name": "omicron",
-            "columns": ["TGA", "testing", "", "Omicron", "analytical", "sensitivity"],
-            "align": "middle",
-        },
-        {
-            "name": "quality",
-            "columns": ["TGA", "testing", "", "Device", "quality"],
-            "align": "middle",
-        },
-        {
-            "name": "provided",
-            "columns": ["Manufacturer", "provided evidence"],
-            "align": "left",
-        },
-    ]
+    # the columns are stored as parallel tuples, one item per column
+    _col_names = (
+        "artg",
+        "sponsor",
+        "manufacturer",
+        "name",
+        "batch",
+        "wild",
+        "delta",
+        "omicron",
+        "quality",
+        "provided",
+    )
+    _col_aligns = (
+        "left",
+        "left",
+        "left",
+        "left",
+        "middle",
+        "middle",
+        "middle",
+        "middle",
+        "middle",
+        "left",
+    )
+    _col_headers = (
+        ("ARTG",),
+        ("Sponsor",),
+        ("Manufacturer",),
+        ("Test Kit name",),
+        ("TGA testing", "", "Batch number"),
+        ("TGA", "testing", "", "Wild type", "analytical", "sensitivity"),
+        ("TGA", "testing", "", "Delta", "analytical", "sensitivity"),
+        ("TGA", "testing", "", "Omicron", "analytical", "sensitivity"),
+        ("TGA", "testing", "", "Device", "quality"),
+        ("Manufacturer", "provided evidence"),
+    )
     _col_sep = "  "
 
     def __init__(self):
         self._pdf_header_lines = []
-        self._pdf_header_cols = len(self._raw_columns)
-        self._pdf_header_rows = max([len(h.get("columns")) for h in self._raw_columns])
+        self._pdf_header_cols = len(self._col_names)
+        self._pdf_header_rows = max([len(h) for h in self._col_headers])
 
         self._build()
 
         self._actual: dict[int, list[dict[str, int]]] = {}
+        self._header_indexes_cache: typing.Optional[dict[int, dict]] = None
+        self._row_plan_cache: typing.Optional[list[tuple]] = None
 
     @property
     def is_complete(self):
@@ -142,44 +184,47 @@ class PdfTableHeader:
 
     @property
     def header_indexes(self) -> dict[int, dict]:
-        initial = {}
-        for line_index, line_headers in self._actual.items():
+        # the column positions don't change once all the header lines are found
+        if self._header_indexes_cache is not None:
+            return self._header_indexes_cache
+
+        result = self._compute_header_indexes()
+        if self.is_complete:
+            self._header_indexes_cache = result
+        return result
+
+    def _compute_header_indexes(self) -> dict[int, dict]:
+        # the widest extent of each column across all the header lines
+        starts: dict[int, int] = {}
+        ends: dict[int, int] = {}
+        for line_headers in self._actual.values():
             for header in line_headers:
                 header_index = header.get("item")
                 start_index = header.get("start_index")
                 end_index = header.get("end_index")
-                name = self._raw_columns[header_index].get("name")
-
-                value = {"name": name, "start": start_index, "end": end_index}
-
-                if header_index not in initial:
-                    initial[header_index] = value
-                    continue
 
-                if start_index <= initial[header_index]["start"]:
-                    initial[header_index]["start"] = start_index
-                if end_index >= initial[header_index]["end"]:
-                    initial[header_index]["end"] = end_index
+                if header_index not in starts or start_index <= starts[header_index]:
+                    starts[header_index] = start_index
+                if header_index not in ends or end_index >= ends[header_index]:
+                    ends[header_index] = end_index
 
-        header_count = len(self._raw_columns)
+        header_count = len(self._col_names)
         col_sep = self._col_sep
         col_sep_len = len(col_sep)
 
         result = {}
-        for index, header in initial.items():
-            name = header.get("name")
-            start_index = header.get("start")
-            end_index = header.get("end")
-            align = self._raw_columns[index].get("align")
+        for index in starts:
+            name = self._col_names[index]
+            start_index = starts[index]
+            end_index = ends[index]
+            align = self._col_aligns[index]
 
             # get the next and previous items
             # to build the start and end index for the column
             if (index + 1) < header_count:
-                next_index = index + 1
-                next_item = initial[next_index]
-                next_start = next_item.get("start")
-                next_end = next_item.get("end")
-                next_align = self._raw_columns[next_index].get("align")
+                next_start = starts[index + 1]
+                next_end = ends[index + 1]
+                next_align = self._col_aligns[index + 1]
                 right_diff = next_start - end_index
             else:
                 next_start = -1
@@ -189,10 +234,8 @@ class PdfTableHeader:
                 right_diff = None
 
             if index > 0:
-                prev_index = index - 1
-                prev_item = initial[prev_index]
-                prev_start = prev_item.get("start")
-                prev_end = prev_item.get("end")
+                prev_start = starts[index - 1]
+                prev_end = ends[index - 1]
                 left_diff = start_index - prev_end
             else:
                 prev_start = None
@@ -202,16 +245,12 @@ class PdfTableHeader:
 
             # get the diffs for the prev x2 and next x2
             if (index + 2) < header_count:
-                next_2_index = index + 2
-                next_2_item = initial[next_2_index]
-                next_right_diff = next_2_item.get("start") - next_end
+                next_right_diff = starts[index + 2] - next_end
             else:
                 next_right_diff = None
 
             if index > 1:
-                prev_2_index = index - 2
-                prev_2_item = initial[prev_2_index]
-                prev_left_diff = prev_start - prev_2_item.get("end")
+                prev_left_diff = prev_start - ends[index - 2]
             else:
                 prev_left_diff = None
 
@@ -266,6 +305,8 @@ class PdfTableHeader:
                     )
             if result:
                 self._actual[headers_index] = result
+                self._header_indexes_cache = None
+                self._row_plan_cache = None
                 return True
         if not result:
             return False
@@ -273,61 +314,81 @@ class PdfTableHeader:
             raise ValueError()
 
     def get_row(self, line: str) -> typing.Optional[dict]:
-        data = self.header_indexes
-        col_count = self._pdf_header_cols
         col_sep = self._col_sep
         col_sep_len = len(self._col_sep)
 
         result = {}
-        for index in data:
-            item = data[index]
-
-            name = item.get("name")
-            start_index = item.get("start")
-            end_index = item.get("end")
-            align = item.get("align")
-
-            value = line[start_index:end_index]
-
-            if align == "left" and index > 0:
+        for (
+            index,
+            name,
+            start_index,
+            end_index,
+            value_start,
+            check_left,
+            is_last,
+        ) in self._get_row_plan():
+            value = line[value_start:end_index]
+
+            if check_left:
                 confirm_start = start_index - col_sep_len
                 confirm_end = start_index
                 confirm_value = line[confirm_start:confirm_end]
                 confirm = not confirm_value.strip() or confirm_value == col_sep
                 if not confirm:
-                    raise ValueError(item)
-
-            if name == "quality":
-                # fix: expand the extracted text to try to get the value
-                value_start = start_index - 3
-                value_end = end_index
-                value = line[value_start:value_end]
+                    raise ValueError(self.header_indexes[index])
 
-            if value and not value[-1].isspace():
-                # see if the value should include more text to the right
-                extra = 0
-                while True:
-                    extra_start = end_index + (col_sep_len * extra)
-                    extra_end = end_index + (col_sep_len * (extra + 1))
-                    extra_value = line[extra_start:extra_end]
-                    if not extra_value.strip():
-                        break
-                    value += extra_value
-                    extra += 1
-
-            if (index + 1) == col_count:
+            if is_last:
                 value = line[start_index:]
+            elif value and not value[-1].isspace():
+                # see if the value should include more text to the right
+                value += _EXTRA_TEXT_RE.match(line, end_index).group()
 
             result[name] = value
 
         return result
 
+    def _get_row_plan(self) -> list[tuple[int, str, int, int, int, bool, bool]]:
+        if self._row_plan_cache is not None:
+            return self._row_plan_cache
+
+        col_count = self._pdf_header_cols
+        result = []
+        for index, item in self.header_indexes.items():
+            name = item.get("name")
+            start_index = item.get("start")
+            end_index = item.get("end")
+            align = item.get("align")
+
+            if name == "quality":
+                # fix: expand the extracted text to try to get the value
+                value_start = start_index - 3
+            else:
+                value_start = start_index
+
+            check_left = align == "left" and index > 0
+            is_last = (index + 1) == col_count
+
+            result.append(
+                (
+                    index,
+                    name,
+                    start_index,
+                    end_index,
+                    value_start,
+                    check_left,
+                    is_last,
+                )
+            )
+
+        if self.is_complete:
+            self._row_plan_cache = result
+        return result
+
     def _build(self):
         for col in range(self._pdf_header_rows):
             self._pdf_header_lines.append([])
             for row in range(self._pdf_header_cols):
-                row_data = self._raw_columns[row]
-                row_val = row_data.get("columns")
+                row_val = self._col_headers[row]
                 if len(row_val) > col:
                     col_val = row_val[col]
                     value = col_val
@@ -347,21 +408,25 @@ class PdfTableToRatReviewEntries:
 
         multi_product_indicator = indicators["multiple-products"]
 
+        # bind the per-row helpers once, as the loop runs for every line of the table
+        norm = self._norm
+        norm_name = self._norm_name
+        dict_add = self._dict_add
+        list_add = self._list_add
+
         for item in data:
-            artg = self._norm(item.get("artg"))
-            sponsor = self._norm(item.get("sponsor"))
-            manufacturer = self._norm(item.get("manufacturer"))
-            is_new_name, name = self._norm_name(
-                item.get("name"), multi_product_indicator
-            )
-            batch = self._norm(item.get("batch"))
-            wild = self._norm(item.get("wild"))
-            delta = self._norm(item.get("delta"))
-            omicron = self._norm(item.get("omicron"))
-            quality = self._norm(item.get("quality"))
-            provided = self._norm(item.get("provided"))
-
-            if artg and not all(c.isdigit() for c in artg):
+            artg = norm(item.get("artg"))
+            sponsor = norm(item.get("sponsor"))
+            manufacturer = norm(item.get("manufacturer"))
+            is_new_name, name = norm_name(item.get("name"), multi_product_indicator)
+            batch = norm(item.get("batch"))
+            wild = norm(item.get("wild"))
+            delta = norm(item.get("delta"))
+            omicron = norm(item.get("omicron"))
+            quality = norm(item.get("quality"))
+            provided = norm(item.get("provided"))
+
+            if artg and not artg.isdigit():
                 artg_comment = artg
                 artg = None
             else:
@@ -391,7 +456,7 @@ class PdfTableToRatReviewEntries:
 
             if not name or not current_names or is_new_name:
                 # move on to the next product name
-                current_names.append("")
+                current_names.append([])
 
             if batch:
                 # move on to the next batch
@@ -399,29 +464,27 @@ class PdfTableToRatReviewEntries:
 
             if not provided or not current_evidence or ":" in provided:
                 # move on to the next group of manufacturer evidence
-                current_evidence.append("")
+                current_evidence.append([])
 
-            self._dict_add(current_entry, "artg", artg)
-            self._dict_add(current_entry, "sponsor", sponsor)
-            self._dict_add(current_entry, "manufacturer", manufacturer)
-            self._dict_add(current_entry, "artg_comment", artg_comment)
+            dict_add(current_entry, "artg", artg)
+            dict_add(current_entry, "sponsor", sponsor)
+            dict_add(current_entry, "manufacturer", manufacturer)
+            dict_add(current_entry, "artg_comment", artg_comment)
 
-            self._list_add(current_names, name)
+            list_add(current_names, name)
 
-            self._dict_add(current_batches[-1], "batch", batch)
-            self._dict_add(current_batches[-1], "wild", wild)
-            self._dict_add(current_batches[-1], "delta", delta)
-            self._dict_add(current_batches[-1], "omicron", omicron)
-            self._dict_add(current_batches[-1], "quality", quality)
+            dict_add(current_batches[-1], "batch", batch)
+            dict_add(current_batches[-1], "wild", wild)
+            dict_add(current_batches[-1], "delta", delta)
+            dict_add(current_batches[-1], "omicron", omicron)
+            dict_add(current_batches[-1], "quality", quality)
 
-            self._list_add(current_evidence, provided)
+            list_add(current_evidence, provided)
 
         return entries
 
     def _norm(self, value: str) -> typing.Optional[typing.Union[str, bool]]:
-        pattern = re.compile(r"\s+")
-        with_spaces = pattern.sub(" ", value)
-        result = with_spaces.strip()
+        result = " ".join(value.split())
 
         if result == "yes":
             return True
@@ -431,14 +494,16 @@ class PdfTableToRatReviewEntries:
         if not result:
             return None
 
+        # short values such as the review indicators repeat in most rows
+        if len(result) < 32:
+            result = sys.intern(result)
+
         return result
 
     def _norm_name(self, value: str, multiple_name_indicator: str):
-        pattern = re.compile(r"\s+")
-        with_spaces = pattern.sub(" ", value)
-        result = with_spaces.strip()
+        result = " ".join(value.split())
 
-        if result and with_spaces and with_spaces.startswith(multiple_name_indicator):
+        if result and value.startswith(multiple_name_indicator):
             return True, result
 
         if not result:
@@ -447,18 +512,26 @@ class PdfTableToRatReviewEntries:
         return False, result
 
     def _dict_add(self, container: dict, key: str, value: typing.Any) -> None:
-        if key not in container:
-            container[key] = ""
-        container[key] += " " + str(value) if value is not None else ""
-        container[key] = container[key].strip()
+        values = container.setdefault(key, [])
+        if value is not None:
+            values.append(str(value))
 
     def _list_add(self, container: list, value: str) -> None:
-        container[-1] = container[-1] + " " + (value or "")
-        container[-1] = container[-1].strip()
+        if value:
+            container[-1].append(value)
 
     def _build_entry(
         self, entry: dict, names: list, batches: list, evidence: list, indicators: dict
     ):
+        # join the text collected for each field across the entry's lines
+        entry = {key: " ".join(values) for key, values in entry.items()}
+        names = [" ".join(values) for values in names]
+        batches = [
+            {key: " ".join(values) for key, values in batch.items()}
+            for batch in batches
+        ]
+        evidence = [" ".join(values) for values in evidence]
+
         # build the manufacturer evidence
         manufacturer_evidence = []
         current_group = None
@@ -483,8 +556,8 @@ class PdfTableToRatReviewEntries:
 
         # build the review batch information
         batch_items = []
-        indicator_review_yes = indicators["yes"]
-        indicator_review_no = indicators["no"]
+        indicator_review_yes = sys.intern(indicators["yes"])
+        indicator_review_no = sys.intern(indicators["no"])
         for item in batches:
             batch = item.get("batch")
             tests = []
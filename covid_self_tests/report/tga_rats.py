@@ -1,151 +1,193 @@
+import ast
 import csv
 import dataclasses
-import itertools
-import json
 import logging
 import os
 import pathlib
+from concurrent import futures
 from datetime import timezone, datetime
 
 from covid_self_tests.report import pdf_table, models
 
+try:
+    # optional: also write the outcomes as parquet when pyarrow is available
+    import pyarrow
+    from pyarrow import parquet
+except ImportError:
+    pyarrow = None
+    parquet = None
+
 logger = logging.getLogger(__name__)
 
 
 class Report:
-    _keys_details_items = {
-        "url",
-        "data-group",
-        "Australian sponsor",
-        "ARTG",
-        "Manufacturer",
-        "Date approved for supply",
-        "Type of test",
-        "Intended use",
-        "Model/Type of use",
-        "files",
-    }
-    _keys_details_pages = {"data-group", "date", "title", "url", "summary", "files"}
-    _keys_sensitivity = {
-        "data-group",
-        "Name of self-test* and how to use the test",
-        "urls",
-        "Sample type used",
-        "Australian Sponsor (supplier)",
-        "Manufacturer",
-        "ARTG",
-        "Clinical Sensitivity",
-        "Date Approved",
-        "Shelf Life",
-        "files",
-    }
+    _keys_details_items = frozenset(
+        {
+            "url",
+            "data-group",
+            "Australian sponsor",
+            "ARTG",
+            "Manufacturer",
+            "Date approved for supply",
+            "Type of test",
+            "Intended use",
+            "Model/Type of use",
+            "files",
+        }
+    )
+    _keys_details_pages = frozenset(
+        {"data-group", "date", "title", "url", "summary", "files"}
+    )
+    _keys_sensitivity = frozenset(
+        {
+            "data-group",
+            "Name of self-test* and how to use the test",
+            "urls",
+            "Sample type used",
+            "Australian Sponsor (supplier)",
+            "Manufacturer",
+            "ARTG",
+            "Clinical Sensitivity",
+            "Date Approved",
+            "Shelf Life",
+            "files",
+        }
+    )
+
+    _pdf_suffixes = frozenset({".pdf", ".txt"})
 
     def __init__(self):
         self._data_dir = pathlib.Path(os.environ.get("OUTPUT_DIR"))
         self._files_dir = self._data_dir / "filestore" / "full"
         self._pdf_table_doc = pdf_table.PdfTableDocument()
         self._outcome_dir = self._data_dir / "outcomes"
+        # rows from the same csv file have the same keys, so only check them once
+        self._checked_keys: set[tuple[tuple, frozenset]] = set()
 
         self._outcome_dir.mkdir(exist_ok=True, parents=True)
 
     def run(self):
         csv_data = self.read_csv_files()
-        pdf_data = self.read_pdf_text_files()
+        pdf_data = self._index_pdf_files()
 
         most_recent = self._most_recent_data(csv_data, pdf_data)
         combined_data = self._combine_data(most_recent)
 
-        data = sorted([(k, v) for k, v in combined_data.items()])
+        # sort by the product match info only, the product info is not comparable
+        data = sorted(combined_data.items(), key=lambda x: x[0])
 
         now = datetime.now(timezone.utc)
         outcome_path = (
             self._outcome_dir
             / f"{now.isoformat(timespec='seconds').replace(':', '-')}-outcomes.csv"
         )
-        field_names = [i.name for i in dataclasses.fields(models.RatInfo)]
+        field_names = tuple(i.name for i in dataclasses.fields(models.RatInfo))
+        rows = []
+        for match, info in data:
+            item = models.RatInfo(
+                artg=match.artg,
+                title=match.title,
+                details_url=info.details_url,
+                sponsor=info.sponsor,
+                date_approved=info.date_approved,
+                manufacturer=info.manufacturer,
+                test_type=info.test_type,
+                intended_use=info.intended_use,
+                date_updated=info.date_updated,
+                type_of_use=info.type_of_use,
+                instructions_url=info.instructions_url,
+                sample_type=info.sample_type,
+                sensitivity=info.sensitivity,
+                expiry=info.expiry,
+                comment=info.comment,
+                variants=info.variants,
+                review_wild=info.review_wild,
+                review_delta=info.review_delta,
+                review_omicron=info.review_omicron,
+                review_quality=info.review_quality,
+                errors=str(info.errors) if info.errors else "",
+            )
+            rows.append([getattr(item, name) for name in field_names])
+
         with open(outcome_path, "wt", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, field_names)
-            writer.writeheader()
-
-            for match, info in data:
-                item = models.RatInfo(
-                    artg=match.artg,
-                    title=match.title,
-                    details_url=info.details_url,
-                    sponsor=info.sponsor,
-                    date_approved=info.date_approved,
-                    manufacturer=info.manufacturer,
-                    test_type=info.test_type,
-                    intended_use=info.intended_use,
-                    date_updated=info.date_updated,
-                    type_of_use=info.type_of_use,
-                    instructions_url=info.instructions_url,
-                    sample_type=info.sample_type,
-                    sensitivity=info.sensitivity,
-                    expiry=info.expiry,
-                    comment=info.comment,
-                    variants=info.variants,
-                    review_wild=info.review_wild,
-                    review_delta=info.review_delta,
-                    review_omicron=info.review_omicron,
-                    review_quality=info.review_quality,
-                    errors=str(info.errors) if info.errors else "",
-                )
-                writer.writerow(dataclasses.asdict(item))
+            writer = csv.writer(f)
+            writer.writerow(field_names)
+            writer.writerows(rows)
+
+        if pyarrow is not None:
+            self._write_parquet(outcome_path.with_suffix(".parquet"), field_names, rows)
 
         return data
 
-    def read_pdf_text_files(self):
-        data = {}
-        for entry in self._files_dir.iterdir():
-            if not entry.is_file() or entry.suffix not in [".pdf", ".txt"]:
-                continue
+    def _write_parquet(
+        self, path: pathlib.Path, field_names: tuple[str, ...], rows: list[list]
+    ) -> None:
+        # transpose the rows into columns in one pass
+        columns = list(zip(*rows)) or [()] * len(field_names)
+        table = pyarrow.table(
+            {
+                name: pyarrow.array(column, type=pyarrow.string())
+                for name, column in zip(field_names, columns)
+            }
+        )
+        parquet.write_table(table, path, compression="zstd")
 
-            key = entry.stem.split("-")[0]
-            if key not in data:
-                data[key] = {}
+    def _index_pdf_files(self):
+        # only find the files, the pdf text is read once it is known to be needed
+        data = {}
+        with os.scandir(self._files_dir) as entries:
+            for entry in entries:
+                stem, suffix = os.path.splitext(entry.name)
+                if suffix not in self._pdf_suffixes or not entry.is_file():
+                    continue
 
-            data[key][entry.suffix.strip(".")] = entry
+                key = stem.split("-", 1)[0]
+                if key not in data:
+                    data[key] = {}
 
-            if entry.suffix == ".txt":
-                data[key]["data"] = self._pdf_table_doc.read(entry)
+                data[key][suffix.strip(".")] = pathlib.Path(entry.path)
         return data
 
     def read_csv_files(self):
-        csv_data = {}
-        for entry in self._data_dir.iterdir():
-            if not entry.is_file() or not entry.suffix == ".csv":
-                continue
-
-            csv_data[entry] = []
-            with open(entry, "rt", newline="", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    csv_data[entry].append(row)
-
+        # only the most recent data is used, so only read those files
+        csv_paths = self._list_csv_files()
+        csv_recent_paths = self._most_recent_group_paths(csv_paths)
+        max_workers = min(len(csv_recent_paths), os.cpu_count() or 1)
+        with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            csv_rows = executor.map(self._load_csv, csv_recent_paths.values())
+            csv_data = dict(zip(csv_recent_paths.keys(), csv_rows))
         return csv_data
 
-    def _most_recent_data(self, csv_data, pdf_data):
-        # get only the most recent data
-        csv_sorted = sorted(
-            [(*k.stem.split("-tga-rats-"), v) for k, v in csv_data.items()]
-        )
-        csv_grouped = [
-            (k, list(g)) for k, g in itertools.groupby(csv_sorted, key=lambda x: x[0])
+    def _list_csv_files(self) -> list[pathlib.Path]:
+        return [
+            entry
+            for entry in self._data_dir.iterdir()
+            if entry.is_file() and entry.suffix == ".csv"
         ]
-        csv_recent = {name: data for date, name, data in csv_grouped[-1][1]}
-
-        csv_review = sorted(
-            [
-                (
-                    i.get("file_urls"),
-                    json.loads(i.get("files").replace("'", '"'))[0]["path"],
-                )
-                for i in csv_recent["review"]
-            ]
+
+    def _most_recent_group_paths(
+        self, paths: list[pathlib.Path]
+    ) -> dict[str, pathlib.Path]:
+        csv_files = [(*p.stem.split("-tga-rats-"), p) for p in paths]
+        recent_date = max(date for date, name, path in csv_files)
+        return {name: path for date, name, path in csv_files if date == recent_date}
+
+    def _load_csv(self, path: pathlib.Path) -> list[dict]:
+        with open(path, "rt", newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            return list(reader)
+
+    def _most_recent_data(self, csv_recent, pdf_data):
+        csv_review = max(
+            (
+                i.get("file_urls"),
+                # the files column is the python repr of the files pipeline list
+                ast.literal_eval(i.get("files"))[0]["path"],
+            )
+            for i in csv_recent["review"]
         )
-        csv_review_pdf_key = pathlib.Path(csv_review[-1][1]).stem
-        pdf_recent = pdf_data[csv_review_pdf_key]["data"]
+        csv_review_pdf_key = pathlib.Path(csv_review[1]).stem
+        pdf_recent = self._pdf_table_doc.read(pdf_data[csv_review_pdf_key]["txt"])
 
         raw_data = {
             "details-items": csv_recent["details-items"],
@@ -156,10 +198,12 @@ class Report:
         return raw_data
 
     def _combine_data(self, data: dict):
+        # the sources are added in priority order: details, sensitivity, review
+        # (see ProductInfo.set_prop)
         result: dict[models.ProductMatchInfo, models.ProductInfo] = {}
 
         # create a mapping between the url and the detail page info
-        details_pages_urls = {i.get("url"): i for i in data["details-pages"]}
+        details_pages_urls = {i["url"]: i for i in data["details-pages"]}
 
         # details items and pages
         for item in data["details-items"]:
@@ -175,7 +219,7 @@ class Report:
             artg = raw_artg.split("(")[-1].strip(" )")
             # tga_title = raw_artg.replace(sponsor, "").replace(artg, "").strip(" ()-")
 
-            details_page_item = details_pages_urls.get(url)
+            details_page_item = details_pages_urls[url]
             date_updated = details_page_item.get("date")
             product_name = details_page_item.get("title")
             # details_page_summary = details_page_item.get("summary")
@@ -205,8 +249,8 @@ class Report:
 
             # keys check
             keys_mapping = [
-                (set(item.keys()), self._keys_details_items),
-                (set(details_page_item.keys()), self._keys_details_pages),
+                (item, self._keys_details_items),
+                (details_page_item, self._keys_details_pages),
             ]
             self._check_keys(keys_mapping)
 
@@ -228,19 +272,20 @@ class Report:
             if not info.is_self_test:
                 continue
 
-            if info not in result:
-                result[info] = models.ProductInfo()
+            product = result.get(info)
+            if product is None:
+                product = result[info] = models.ProductInfo()
 
-            result[info].set_prop("instructions_url", url)
-            result[info].set_prop("sample_type", sample_type)
-            result[info].set_prop("sponsor", sponsor)
-            result[info].set_prop("manufacturer", manufacturer)
-            result[info].set_prop("sensitivity", sensitivity)
-            result[info].set_prop("date_approved", date_approved)
-            result[info].set_prop("expiry", expiry)
+            product.set_prop("instructions_url", url)
+            product.set_prop("sample_type", sample_type)
+            product.set_prop("sponsor", sponsor)
+            product.set_prop("manufacturer", manufacturer)
+            product.set_prop("sensitivity", sensitivity)
+            product.set_prop("date_approved", date_approved)
+            product.set_prop("expiry", expiry)
 
             # keys check
-            keys_mapping = [(set(item.keys()), self._keys_sensitivity)]
+            keys_mapping = [(item, self._keys_sensitivity)]
             self._check_keys(keys_mapping)
 
         for item in data["review"].entries:
@@ -249,6 +294,7 @@ class Report:
             manufacturer = item.manufacturer
             sponsor = item.sponsor
             evidence = sorted({i.name.strip(" *") for i in item.manufacturer_evidence})
+            variants = ",".join(evidence)
             product_names = item.product_names
             batches = item.batches
 
@@ -263,38 +309,50 @@ class Report:
                 if not info.is_self_test:
                     continue
 
-                if info not in result:
-                    result[info] = models.ProductInfo()
+                product = result.get(info)
+                if product is None:
+                    product = result[info] = models.ProductInfo()
 
-                result[info].set_prop("comment", comment)
-                result[info].set_prop("sponsor", sponsor)
-                result[info].set_prop("manufacturer", manufacturer)
-                result[info].set_prop("variants", ",".join(evidence))
-                result[info].set_prop("review_wild", review_result.get("wild"))
-                result[info].set_prop("review_delta", review_result.get("delta"))
-                result[info].set_prop("review_omicron", review_result.get("omicron"))
-                result[info].set_prop("review_quality", review_result.get("quality"))
+                product.set_prop("comment", comment)
+                product.set_prop("sponsor", sponsor)
+                product.set_prop("manufacturer", manufacturer)
+                product.set_prop("variants", variants)
+                product.set_prop("review_wild", review_result.get("wild"))
+                product.set_prop("review_delta", review_result.get("delta"))
+                product.set_prop("review_omicron", review_result.get("omicron"))
+                product.set_prop("review_quality", review_result.get("quality"))
 
         return result
 
-    def _check_keys(self, keys: list[tuple[set, set]]) -> None:
-        for actual, expected in keys:
-            extra_keys = actual - expected
+    def _check_keys(self, keys: list[tuple[dict, frozenset]]) -> None:
+        for item, expected in keys:
+            checked = (tuple(item), expected)
+            if checked in self._checked_keys:
+                continue
+
+            extra_keys = item.keys() - expected
             if extra_keys:
                 raise ValueError(extra_keys)
 
+            self._checked_keys.add(checked)
+
     def _eval_review_batches(self, batches) -> dict:
         if not batches:
             return {}
 
         # assume the last batch code is the most recent
-        batches_sorted = sorted(batches, key=lambda x: x.batch)
-        batch = batches_sorted[-1]
-
-        if len(batches) > 1:
-            previous_all_bad = all([not batch.all_compliant for batch in batches[0:-1]])
-            previous_all_good = all([batch.all_compliant for batch in batches[0:-1]])
-            if not previous_all_bad and not previous_all_good:
+        # (reversed so that the last of any equal batch codes is used)
+        batch = max(reversed(batches), key=lambda x: x.batch)
+
+        # the previous batches must be either all compliant or all not compliant
+        saw_good = False
+        saw_bad = False
+        for previous in batches[0:-1]:
+            if previous.all_compliant:
+                saw_good = True
+            else:
+                saw_bad = True
+            if saw_good and saw_bad:
                 raise ValueError()
 
         result = {}
@@ -28,6 +28,9 @@ if not xpdf_dir_str:
 
 XPDF_DIR = pathlib.Path(xpdf_dir_str).as_posix()
 
+# Number of xpdf programs to run at the same time (default: number of CPUs)
+# XPDF_WORKERS = 4
+
 
 BOT_NAME = "covid_self_tests"
 
@@ -3,6 +3,9 @@ import typing
 
 import scrapy
 
+# whitespace, including zero-width and other invisible separators
+_WS_RE = re.compile(r"[\s\u180B\u200B-\u200D\u2060\uFEFF]+")
+
 
 class TgaRatsSpider(scrapy.Spider):
     name = "tga-rats"
@@ -28,6 +31,8 @@ class TgaRatsSpider(scrapy.Spider):
         ]
     )
 
+    _urls_sep = " || "
+
     start_urls = [
         _url_test_sensitivity,
         _url_test_details,
@@ -61,12 +66,18 @@ class TgaRatsSpider(scrapy.Spider):
         table_body = table.css("tbody")
         for row in table_body.xpath("./tr"):
             item = {"data-group": "sensitivity"}
+            row_urls = []
             for header, cell in zip(headers, row.xpath("./td")):
                 texts = cell.xpath(".//text()").getall()
                 item[header] = self._combine_text(" ", texts)
 
-                urls = self._combine_urls(response, cell, item.get("urls", ""))
-                item["urls"] = urls
+                # the urls from later cells are listed first
+                row_urls[:0] = self._element_urls(response, cell)
+                # add the key here to keep the column order of the feed
+                item["urls"] = ""
+
+            if "urls" in item:
+                item["urls"] = self._urls_sep.join(row_urls)
 
             yield item
 
@@ -145,22 +156,25 @@ class TgaRatsSpider(scrapy.Spider):
         }
 
     def _combine_text(self, sep: str, texts) -> str:
-        raw = sep.join([t.strip() for t in texts if t and t.strip()]).strip()
+        stripped = (s for s in (t.strip() for t in texts if t) if s)
+        raw = sep.join(stripped).strip()
+
+        # most cells only contain single spaces, so skip the regex for them
+        if raw.isprintable() and "  " not in raw and "\u180b" not in raw:
+            return raw
+
         result = self._norm_whitespace(raw)
         return result
 
-    def _combine_urls(self, response, element, existing: str = "") -> str:
-        sep = " || "
+    def _combine_urls(self, response, element) -> str:
+        result = self._urls_sep.join(self._element_urls(response, element))
+        return result
 
+    def _element_urls(self, response, element) -> list[str]:
         urls_raw = element.xpath(".//a/@href").getall()
         urls = [response.urljoin(u.strip()) for u in urls_raw if u and u.strip()]
-
-        existing_urls = [u for u in existing.split(sep) if u and u.strip()]
-
-        result = sep.join(urls + existing_urls).strip()
-        return result
+        return urls
 
     def _norm_whitespace(self, value: str) -> str:
-        pattern = re.compile(r"(\s|\u180B|\u200B|\u200C|\u200D|\u2060|\uFEFF)+")
-        result = pattern.sub(" ", value)
+        result = _WS_RE.sub(" ", value)
         return result